@@ -0,0 +1,45 @@
+import re
+
+ADDRESS_ABBREVIATIONS = {
+    'г': 'город',
+    'гор': 'город',
+    'ул': 'улица',
+    # "пр." is both "проспект" and "проезд", so only the unambiguous forms are expanded
+    'пр-т': 'проспект',
+    'пр-д': 'проезд',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'бульв': 'бульвар',
+    'туп': 'тупик',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'д': 'дом',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+
+# a house number reads the same with or without the word
+ADDRESS_OMITTED_WORDS = {'дом'}
+
+# abbreviations make a normalized address longer than the original one
+NORMALIZED_ADDRESS_MAX_LENGTH = 500
+
+ADDRESS_TOKEN_RE = re.compile(r'\w+(?:-\w+)*')
+
+
+def normalize_address(address):
+    """Fold case, punctuation, whitespace and common abbreviations of an address.
+
+    "Москва, ул. Ленина 1" and "москва ул ленина, 1" both become "москва улица ленина 1".
+    """
+    tokens = ADDRESS_TOKEN_RE.findall(address.lower().replace('ё', 'е'))
+    words = (ADDRESS_ABBREVIATIONS.get(token) or token.replace('-', ' ') for token in tokens)
+    normalized_address = ' '.join(word for word in words if word not in ADDRESS_OMITTED_WORDS)
+    return normalized_address[:NORMALIZED_ADDRESS_MAX_LENGTH]
@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+COORDINATES_CACHE_KEY = 'coordinates:place:{address_hash}'
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe LRU mapping whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class CoordinatesCache:
+    """Keeps known coordinates in process memory and in the shared Django cache.
+
+    Only filled coordinates are cached: an address waiting for the geocoding
+    worker keeps going to the database, so its coordinates show up as soon as
+    they are saved. Other processes drop a changed entry from memory after `local_ttl`.
+    """
+
+    def __init__(self, maxsize, local_ttl, shared_ttl, stats_log_interval=None):
+        self.local = LRUCache(maxsize, min(local_ttl, shared_ttl))
+        self.shared_ttl = shared_ttl
+        self.stats_log_interval = stats_log_interval
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @staticmethod
+    def get_key(address):
+        address_hash = hashlib.md5(address.encode()).hexdigest()
+        return COORDINATES_CACHE_KEY.format(address_hash=address_hash)
+
+    def get_many(self, addresses):
+        found = {}
+        keys = {}
+        for address in addresses:
+            coordinates = self.local.get(address)
+            if coordinates is None:
+                keys[self.get_key(address)] = address
+            else:
+                found[address] = coordinates
+        local_hits = len(found)
+
+        shared_found = cache.get_many(keys) if keys else {}
+        for key, coordinates in shared_found.items():
+            found[keys[key]] = coordinates
+            self.local.set(keys[key], coordinates)
+
+        with self.stats_lock:
+            previous_lookups_count = sum(self.stats.values())
+            self.stats['local_hits'] += local_hits
+            self.stats['shared_hits'] += len(shared_found)
+            self.stats['misses'] += len(keys) - len(shared_found)
+            lookups_count = sum(self.stats.values())
+        # log every time the lookups count passes a multiple of the interval
+        interval = self.stats_log_interval
+        if interval and previous_lookups_count // interval != lookups_count // interval:
+            self.log_stats()
+        return found
+
+    def set_many(self, coordinates):
+        for address, point in coordinates.items():
+            self.local.set(address, point)
+        if coordinates:
+            cache.set_many(
+                {self.get_key(address): point for address, point in coordinates.items()},
+                self.shared_ttl,
+            )
+
+    def invalidate(self, addresses):
+        addresses = list(addresses)
+        for address in addresses:
+            self.local.delete(address)
+        if addresses:
+            cache.delete_many([self.get_key(address) for address in addresses])
+
+    def get_stats(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['local_size'] = len(self.local)
+        return stats
+
+    def log_stats(self):
+        stats = self.get_stats()
+        lookups_count = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        hit_rate = (stats['local_hits'] + stats['shared_hits']) / lookups_count if lookups_count else 0
+        logger.info(
+            'Кеш координат: в памяти %(local_hits)s, в общем кеше %(shared_hits)s, '
+            'промахов %(misses)s, адресов в памяти %(local_size)s, попаданий %(hit_rate).0f%%',
+            dict(stats, hit_rate=hit_rate * 100),
+        )
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+
+_coordinates_cache = None
+
+
+def get_coordinates_cache():
+    global _coordinates_cache
+    if _coordinates_cache is None:
+        _coordinates_cache = CoordinatesCache(
+            maxsize=settings.COORDINATES_CACHE_SIZE,
+            local_ttl=settings.COORDINATES_CACHE_TTL,
+            shared_ttl=settings.COORDINATES_LIFETIME * 60 * 60,
+            stats_log_interval=settings.COORDINATES_CACHE_STATS_INTERVAL,
+        )
+    return _coordinates_cache
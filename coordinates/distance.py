@@ -0,0 +1,47 @@
+import numpy as np
+from django.conf import settings
+from geopy import distance
+
+EARTH_RADIUS = 6371008.8
+
+
+class DistanceEngine:
+    """Computes distances in meters from one point to an array of points.
+
+    The `haversine` mode treats the Earth as a sphere and handles all points in a
+    single NumPy pass, its error stays within 0.5%. The `geodesic` mode falls back
+    to geopy's ellipsoidal distance, point by point.
+    Points with unknown coordinates are passed as NaN and get NaN distance.
+    """
+    HAVERSINE = 'haversine'
+    GEODESIC = 'geodesic'
+    ACCURACY_MODES = [HAVERSINE, GEODESIC]
+
+    def __init__(self, accuracy=None):
+        self.accuracy = accuracy or settings.DISTANCE_ACCURACY
+        if self.accuracy not in self.ACCURACY_MODES:
+            raise ValueError(f'Unknown distance accuracy mode: {self.accuracy}')
+
+    def get_distances(self, origin, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if self.accuracy == self.GEODESIC:
+            return self._get_geodesic_distances(origin, points)
+        return self._get_haversine_distances(origin, points)
+
+    @staticmethod
+    def _get_haversine_distances(origin, points):
+        origin_lat, origin_lon = np.radians(np.asarray(origin, dtype=float))
+        lats, lons = np.radians(points).T
+        a = (
+            np.sin((lats - origin_lat) / 2) ** 2
+            + np.cos(origin_lat) * np.cos(lats) * np.sin((lons - origin_lon) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+    @staticmethod
+    def _get_geodesic_distances(origin, points):
+        origin = tuple(map(float, origin))
+        return np.array([
+            distance.distance(origin, point).m if not np.isnan(point).any() else np.nan
+            for point in points
+        ])
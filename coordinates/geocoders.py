@@ -0,0 +1,173 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from coordinates.addresses import normalize_address
+
+
+class GeocoderUnavailable(Exception):
+    pass
+
+
+class InvalidGeocoderResponse(Exception):
+    pass
+
+
+GEOCODING_ERRORS = (requests.RequestException, GeocoderUnavailable, InvalidGeocoderResponse)
+
+
+class BaseGeocoder:
+    """Turns addresses into `(longitude, latitude)` string pairs.
+
+    The backend is chosen by the GEOCODER_BACKEND setting and built with
+    `from_settings()`. `get_coordinates` returns None for an unknown address and
+    raises one of GEOCODING_ERRORS when it can't tell.
+    """
+
+    @classmethod
+    def from_settings(cls):
+        return cls()
+
+    def get_coordinates(self, address):
+        raise NotImplementedError
+
+    def get_coordinates_or_error(self, address):
+        try:
+            return self.get_coordinates(address)
+        except GEOCODING_ERRORS as error:
+            return error
+
+    def get_coordinates_many(self, addresses):
+        """Geocode addresses, results come in the order of addresses.
+
+        An address the geocoder does not know gets None. An address that failed
+        because of a network error, an unexpected response or an unavailable
+        geocoder gets the exception.
+        """
+        return [self.get_coordinates_or_error(address) for address in addresses]
+
+
+def format_coordinates(lon, lat):
+    return f'{lon:.6f}', f'{lat:.6f}'
+
+
+class OfflineGeocoder(BaseGeocoder):
+    """Deterministic geocoder for tests and load testing, makes no network calls.
+
+    Addresses found in the gazetteer, a JSON file mapping addresses to
+    `[longitude, latitude]`, get their coordinates from it. Any other address gets
+    a stable point inside `bounding_box` derived from the hash of its normalized form.
+    """
+
+    def __init__(self, bounding_box, gazetteer_path=None):
+        self.min_lon, self.min_lat, self.max_lon, self.max_lat = bounding_box
+        self.gazetteer = {}
+        if gazetteer_path:
+            with open(gazetteer_path, encoding='utf-8') as gazetteer_file:
+                self.gazetteer = {
+                    normalize_address(address): tuple(coordinates)
+                    for address, coordinates in json.load(gazetteer_file).items()
+                }
+
+    @classmethod
+    def from_settings(cls):
+        return cls(settings.GEOCODER_OFFLINE_BOUNDING_BOX, settings.GEOCODER_GAZETTEER_PATH)
+
+    def get_coordinates(self, address):
+        normalized_address = normalize_address(address)
+        if normalized_address in self.gazetteer:
+            return format_coordinates(*self.gazetteer[normalized_address])
+
+        address_hash = hashlib.sha256(normalized_address.encode()).digest()
+        lon_fraction = int.from_bytes(address_hash[:8], 'big') / 2 ** 64
+        lat_fraction = int.from_bytes(address_hash[8:16], 'big') / 2 ** 64
+        return format_coordinates(
+            self.min_lon + lon_fraction * (self.max_lon - self.min_lon),
+            self.min_lat + lat_fraction * (self.max_lat - self.min_lat),
+        )
+
+
+class RecordingGeocoder(BaseGeocoder):
+    """Passes addresses to another backend and saves its answers to a JSON file.
+
+    The file is later served by `ReplayGeocoder`. Failed lookups are not recorded.
+    """
+
+    def __init__(self, geocoder, recordings_path):
+        self.geocoder = geocoder
+        self.recordings_path = Path(recordings_path)
+        self.recordings = load_recordings(self.recordings_path)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        geocoder = import_string(settings.GEOCODER_RECORDED_BACKEND).from_settings()
+        return cls(geocoder, settings.GEOCODER_RECORDINGS_PATH)
+
+    def get_coordinates(self, address):
+        coordinates = self.get_coordinates_many([address])[0]
+        if isinstance(coordinates, Exception):
+            raise coordinates
+        return coordinates
+
+    def get_coordinates_many(self, addresses):
+        addresses = list(addresses)
+        results = self.geocoder.get_coordinates_many(addresses)
+        with self.lock:
+            for address, coordinates in zip(addresses, results):
+                if not isinstance(coordinates, Exception):
+                    self.recordings[address] = coordinates
+            self.recordings_path.write_text(
+                json.dumps(self.recordings, ensure_ascii=False, indent=2),
+                encoding='utf-8',
+            )
+        return results
+
+
+class ReplayGeocoder(BaseGeocoder):
+    """Answers from a file written by `RecordingGeocoder`, unknown addresses get None."""
+
+    def __init__(self, recordings_path):
+        self.recordings = load_recordings(Path(recordings_path))
+
+    @classmethod
+    def from_settings(cls):
+        return cls(settings.GEOCODER_RECORDINGS_PATH)
+
+    def get_coordinates(self, address):
+        return self.recordings.get(address)
+
+
+def load_recordings(recordings_path):
+    if not recordings_path.exists():
+        return {}
+    recordings = json.loads(recordings_path.read_text(encoding='utf-8'))
+    return {
+        address: tuple(coordinates) if coordinates else None
+        for address, coordinates in recordings.items()
+    }
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            _geocoder = import_string(settings.GEOCODER_BACKEND).from_settings()
+    return _geocoder
+
+
+def get_coordinates(address):
+    return get_geocoder().get_coordinates(address)
+
+
+def get_coordinates_many(addresses):
+    return get_geocoder().get_coordinates_many(addresses)
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0002_alter_placecoordinates_update_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placecoordinates',
+            name='failed_attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='неудачных попыток геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='placecoordinates',
+            name='retry_after',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='повторить геокодирование после'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+import re
+
+from django.db import migrations, models
+
+# the rules as they were when this migration was written, later changes get their own migrations
+ADDRESS_ABBREVIATIONS = {
+    'г': 'город',
+    'гор': 'город',
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'бульв': 'бульвар',
+    'туп': 'тупик',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'д': 'дом',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+ADDRESS_OMITTED_WORDS = {'дом'}
+ADDRESS_TOKEN_RE = re.compile(r'\w+(?:-\w+)*')
+
+
+def normalize_address(address):
+    tokens = ADDRESS_TOKEN_RE.findall(address.lower().replace('ё', 'е'))
+    words = (ADDRESS_ABBREVIATIONS.get(token) or token.replace('-', ' ') for token in tokens)
+    return ' '.join(word for word in words if word not in ADDRESS_OMITTED_WORDS)
+
+
+def merge_duplicate_places(apps, schema_editor):
+    place_model = apps.get_model('coordinates', 'PlaceCoordinates')
+    places_by_address = {}
+    for place in place_model.objects.order_by('id'):
+        place.normalized_address = normalize_address(place.address)
+        places_by_address.setdefault(place.normalized_address, []).append(place)
+
+    kept_places = []
+    duplicate_ids = []
+    for places in places_by_address.values():
+        # prefer the place with coordinates, then the most recently updated one
+        places.sort(key=lambda place: (
+            place.latitude is not None and place.longitude is not None,
+            place.update_date is not None,
+            place.update_date,
+        ), reverse=True)
+        kept_places.append(places[0])
+        duplicate_ids.extend(place.id for place in places[1:])
+
+    place_model.objects.filter(id__in=duplicate_ids).delete()
+    place_model.objects.bulk_update(kept_places, ['normalized_address'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0003_place_geocoding_backoff'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placecoordinates',
+            name='normalized_address',
+            field=models.CharField(editable=False, max_length=255, null=True, verbose_name='нормализованный адрес'),
+        ),
+        migrations.RunPython(merge_duplicate_places, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='placecoordinates',
+            name='normalized_address',
+            field=models.CharField(editable=False, max_length=255, unique=True, verbose_name='нормализованный адрес'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0004_placecoordinates_normalized_address'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='placecoordinates',
+            name='address',
+            field=models.CharField(max_length=200, unique=True, verbose_name='адрес'),
+        ),
+        migrations.AlterField(
+            model_name='placecoordinates',
+            name='normalized_address',
+            field=models.CharField(editable=False, max_length=500, unique=True, verbose_name='нормализованный адрес'),
+        ),
+    ]
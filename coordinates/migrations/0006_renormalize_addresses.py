@@ -0,0 +1,76 @@
+import re
+
+from django.db import migrations
+
+# "пр" is no longer expanded to "проспект", since it is also the short form of "проезд"
+ADDRESS_ABBREVIATIONS = {
+    'г': 'город',
+    'гор': 'город',
+    'ул': 'улица',
+    'пр-т': 'проспект',
+    'пр-д': 'проезд',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'бульв': 'бульвар',
+    'туп': 'тупик',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'д': 'дом',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+ADDRESS_OMITTED_WORDS = {'дом'}
+ADDRESS_TOKEN_RE = re.compile(r'\w+(?:-\w+)*')
+NORMALIZED_ADDRESS_MAX_LENGTH = 500
+
+
+def normalize_address(address):
+    tokens = ADDRESS_TOKEN_RE.findall(address.lower().replace('ё', 'е'))
+    words = (ADDRESS_ABBREVIATIONS.get(token) or token.replace('-', ' ') for token in tokens)
+    normalized_address = ' '.join(word for word in words if word not in ADDRESS_OMITTED_WORDS)
+    return normalized_address[:NORMALIZED_ADDRESS_MAX_LENGTH]
+
+
+def renormalize_places(apps, schema_editor):
+    place_model = apps.get_model('coordinates', 'PlaceCoordinates')
+    places_by_address = {}
+    for place in place_model.objects.order_by('id'):
+        places_by_address.setdefault(normalize_address(place.address), []).append(place)
+
+    changed_places = []
+    duplicate_ids = []
+    for normalized_address, places in places_by_address.items():
+        # prefer the place with coordinates, then the most recently updated one
+        places.sort(key=lambda place: (
+            place.latitude is not None and place.longitude is not None,
+            place.update_date is not None,
+            place.update_date,
+        ), reverse=True)
+        duplicate_ids.extend(place.id for place in places[1:])
+        if places[0].normalized_address != normalized_address:
+            places[0].normalized_address = normalized_address
+            changed_places.append(places[0])
+
+    place_model.objects.filter(id__in=duplicate_ids).delete()
+    # a new value may still belong to another changed place, so unique placeholders go first
+    for place in changed_places:
+        place_model.objects.filter(id=place.id).update(normalized_address=f'#{place.id}')
+    place_model.objects.bulk_update(changed_places, ['normalized_address'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0005_placecoordinates_address_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(renormalize_places, migrations.RunPython.noop),
+    ]
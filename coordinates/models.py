@@ -1,18 +1,124 @@
 import datetime
+import logging
+from decimal import Decimal
 
 from django.conf import settings
-from django.db import models
+from django.db import DatabaseError, models, transaction
 from django.utils import timezone
 
-from coordinates.yandex_geo_api import get_coordinates
+from coordinates.addresses import NORMALIZED_ADDRESS_MAX_LENGTH, normalize_address
+from coordinates.cache import get_coordinates_cache
+from coordinates.geocoders import GeocoderUnavailable, get_coordinates_many
+
+GEOCODING_RETRY_DELAY = datetime.timedelta(minutes=10)
+
+logger = logging.getLogger(__name__)
+
+
+class PlaceCoordinatesQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(models.Q(latitude__isnull=True) | models.Q(longitude__isnull=True))
+
+    def stale(self):
+        update_time_delta = datetime.timedelta(hours=settings.COORDINATES_LIFETIME)
+        return self.filter(update_date__lt=timezone.now() - update_time_delta)
+
+    def retry_due(self):
+        return self.filter(models.Q(retry_after__isnull=True) | models.Q(retry_after__lte=timezone.now()))
+
+    def for_addresses(self, addresses):
+        return self.filter(normalized_address__in={normalize_address(address) for address in addresses})
+
+    def enqueue(self, addresses):
+        """Add places without coordinates, the geocoding worker will fill them.
+
+        Runs after orders are committed and while pages are rendered, so a database
+        error is logged instead of failing the request.
+        """
+        normalized_addresses = {normalize_address(address): address for address in filter(None, addresses)}
+        try:
+            with transaction.atomic():
+                self.bulk_create(
+                    [
+                        PlaceCoordinates(address=address, normalized_address=normalized_address)
+                        for normalized_address, address in normalized_addresses.items()
+                    ],
+                    ignore_conflicts=True,
+                )
+        except DatabaseError:
+            logger.exception('Не удалось поставить адреса в очередь на геокодирование')
+
+    def resolve(self, addresses):
+        """Return known coordinates without calling the geocoder.
+
+        Addresses are matched by their normalized form. Unknown addresses are
+        queued for the geocoding worker and resolve to None.
+        """
+        normalized_addresses = {address: normalize_address(address) for address in filter(None, addresses)}
+        coordinates_cache = get_coordinates_cache()
+        coordinates = coordinates_cache.get_many(set(normalized_addresses.values()))
+        uncached_addresses = set(normalized_addresses.values()) - coordinates.keys()
+        if uncached_addresses:
+            places = {
+                place.normalized_address: place
+                for place in self.filter(normalized_address__in=uncached_addresses)
+            }
+            self.enqueue(
+                address for address, normalized_address in normalized_addresses.items()
+                if normalized_address in uncached_addresses and normalized_address not in places
+            )
+            found_coordinates = {
+                normalized_address: place.coordinates for normalized_address, place in places.items()
+                if place.is_coordinates_filled
+            }
+            coordinates_cache.set_many(found_coordinates)
+            coordinates.update(found_coordinates)
+        return {
+            address: coordinates.get(normalized_address)
+            for address, normalized_address in normalized_addresses.items()
+        }
+
+    def geocode(self):
+        """Geocode every place of the queryset and return the ones that failed."""
+        places = list(self)
+        updated_places = []
+        failed_places = []
+        all_coordinates = get_coordinates_many(place.address for place in places)
+        for place, coordinates in zip(places, all_coordinates):
+            if isinstance(coordinates, GeocoderUnavailable):
+                # not the address's fault, it is retried as soon as the geocoder is back
+                failed_places.append(place)
+            elif not isinstance(coordinates, Exception) and place.set_coordinates(coordinates):
+                updated_places.append(place)
+            else:
+                place.record_failure()
+                failed_places.append(place)
+
+        self.model.objects.bulk_update(
+            updated_places,
+            ['latitude', 'longitude', 'update_date', 'failed_attempts', 'retry_after'],
+        )
+        self.model.objects.bulk_update(
+            [place for place in failed_places if place.failed_attempts],
+            ['failed_attempts', 'retry_after'],
+        )
+        # bulk_update sends no post_save, so cached coordinates are dropped here
+        get_coordinates_cache().invalidate(place.normalized_address for place in updated_places)
+        return failed_places
 
 
 class PlaceCoordinates(models.Model):
     address = models.CharField(
         'адрес',
-        max_length=100,
+        max_length=200,
         unique=True
     )
+    normalized_address = models.CharField(
+        'нормализованный адрес',
+        max_length=NORMALIZED_ADDRESS_MAX_LENGTH,
+        unique=True,
+        editable=False,
+    )
     latitude = models.DecimalField(
         verbose_name='Широта',
         max_digits=16,
@@ -30,16 +136,43 @@ class PlaceCoordinates(models.Model):
         null=True,
         auto_now=True,
     )
+    failed_attempts = models.PositiveSmallIntegerField(
+        'неудачных попыток геокодирования',
+        default=0,
+    )
+    retry_after = models.DateTimeField(
+        'повторить геокодирование после',
+        null=True,
+        blank=True,
+        db_index=True,
+    )
 
-    def fill_coordinates(self):
-        update_time_delta = datetime.timedelta(hours=settings.COORDINATES_LIFETIME)
-        if self.is_coordinates_filled and timezone.now() - self.update_date < update_time_delta:
-            return
-        coordinates = get_coordinates(self.address)
+    objects = PlaceCoordinatesQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.normalized_address = normalize_address(self.address)
+        super().save(*args, **kwargs)
+
+    def set_coordinates(self, coordinates):
         if coordinates:
-            self.longitude, self.latitude = coordinates
-            self.save()
+            self.longitude, self.latitude = map(Decimal, coordinates)
+            self.update_date = timezone.now()
+            self.failed_attempts = 0
+            self.retry_after = None
+        return bool(coordinates)
+
+    def record_failure(self):
+        """Postpone the next attempt, doubling the delay up to COORDINATES_LIFETIME."""
+        self.failed_attempts += 1
+        max_retry_delay = datetime.timedelta(hours=settings.COORDINATES_LIFETIME)
+        retry_delay = min(GEOCODING_RETRY_DELAY * 2 ** (self.failed_attempts - 1), max_retry_delay)
+        self.retry_after = timezone.now() + retry_delay
 
     @property
     def is_coordinates_filled(self):
         return self.longitude is not None and self.latitude is not None
+
+    @property
+    def coordinates(self):
+        if self.is_coordinates_filled:
+            return (self.latitude, self.longitude)
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import get_coordinates_cache
+from .models import PlaceCoordinates
+
+
+@receiver([post_save, post_delete], sender=PlaceCoordinates)
+def invalidate_cached_coordinates(sender, instance, **kwargs):
+    get_coordinates_cache().invalidate([instance.normalized_address])
@@ -0,0 +1,63 @@
+import heapq
+
+import numpy as np
+
+
+def to_unit_vectors(points):
+    lats, lons = np.radians(np.asarray(points, dtype=float).reshape(-1, 2)).T
+    return np.column_stack([
+        np.cos(lats) * np.cos(lons),
+        np.cos(lats) * np.sin(lons),
+        np.sin(lats),
+    ])
+
+
+class KDTree:
+    """k-d tree over (latitude, longitude) points.
+
+    Points are stored as unit vectors, so the straight-line distance between them
+    grows monotonically with the great-circle distance and the usual plane pruning
+    stays correct across the antimeridian and near the poles.
+    """
+
+    def __init__(self, points, ids):
+        items = list(zip(to_unit_vectors(points).tolist(), ids))
+        self.root = self._build(items, depth=0)
+
+    def _build(self, items, depth):
+        if not items:
+            return None
+        axis = depth % 3
+        items.sort(key=lambda item: item[0][axis])
+        median = len(items) // 2
+        return (
+            items[median],
+            axis,
+            self._build(items[:median], depth + 1),
+            self._build(items[median + 1:], depth + 1),
+        )
+
+    def query(self, point, k, predicate=None):
+        target = to_unit_vectors(point)[0].tolist()
+        nearest = []
+
+        def visit(node):
+            if node is None:
+                return
+            (vector, point_id), axis, left, right = node
+            if predicate is None or predicate(point_id):
+                squared_distance = sum((a - b) ** 2 for a, b in zip(vector, target))
+                if len(nearest) < k:
+                    heapq.heappush(nearest, (-squared_distance, point_id))
+                elif squared_distance < -nearest[0][0]:
+                    heapq.heapreplace(nearest, (-squared_distance, point_id))
+
+            plane_distance = target[axis] - vector[axis]
+            near, far = (left, right) if plane_distance < 0 else (right, left)
+            visit(near)
+            if len(nearest) < k or plane_distance ** 2 < -nearest[0][0]:
+                visit(far)
+
+        if k > 0:
+            visit(self.root)
+        return [point_id for _, point_id in sorted(nearest, reverse=True)]
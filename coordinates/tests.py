@@ -1,3 +1,98 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import requests
+from django.test import SimpleTestCase
+
+from coordinates.yandex_geo_api import YandexGeocoder
+
+
+class StubGeocoderHandler(BaseHTTPRequestHandler):
+    """Answers like the Yandex geocoder.
+
+    An address "<number>" gets the point "<number> <number>", an address
+    "<number>/<seconds>" gets the same point after that delay.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        address = parse_qs(urlparse(self.path).query)['geocode'][0]
+        self.server.requests.append((time.monotonic(), self.client_address))
+        address, _, delay = address.partition('/')
+        if delay:
+            time.sleep(float(delay))
+
+        body = json.dumps({'response': {'GeoObjectCollection': {'featureMember': [
+            {'GeoObject': {'Point': {'pos': f'{address} {address}'}}},
+        ]}}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class YandexGeocoderTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGeocoderHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}/'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests = []
+
+    def make_geocoder(self, **kwargs):
+        geocoder = YandexGeocoder('apikey', base_url=self.base_url, **kwargs)
+        self.addCleanup(geocoder.session.close)
+        return geocoder
+
+    def test_session_is_reused(self):
+        geocoder = self.make_geocoder(timeout=5)
+
+        for address in ['1', '2', '3']:
+            geocoder.get_coordinates(address)
+
+        client_addresses = {client_address for _, client_address in self.server.requests}
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(client_addresses), 1)
+
+    def test_timeout_is_applied(self):
+        geocoder = self.make_geocoder(timeout=0.2)
+
+        started_at = time.monotonic()
+        with self.assertRaises(requests.Timeout):
+            geocoder.get_coordinates('1/1')
+        self.assertLess(time.monotonic() - started_at, 0.9)
+
+    def test_rate_limit_is_honoured(self):
+        geocoder = self.make_geocoder(timeout=5, max_workers=4, rate_limit=10)
+
+        geocoder.get_coordinates_many([str(number) for number in range(6)])
+
+        request_times = sorted(request_time for request_time, _ in self.server.requests)
+        self.assertEqual(len(request_times), 6)
+        self.assertGreaterEqual(request_times[-1] - request_times[0], 0.45)
+
+    def test_get_coordinates_many_keeps_input_order(self):
+        geocoder = self.make_geocoder(timeout=5, max_workers=4)
+        addresses = ['1/0.3', '2', '3/0.1', '4']
+
+        results = geocoder.get_coordinates_many(addresses)
+
+        self.assertEqual(results, [('1', '1'), ('2', '2'), ('3', '3'), ('4', '4')])
+        self.assertEqual(len(self.server.requests), 4)
@@ -1,21 +1,144 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+
+from coordinates.geocoders import BaseGeocoder, GeocoderUnavailable, InvalidGeocoderResponse
+
+
+class RateLimiter:
+    """Spaces calls out so that no more than `rate` of them start per second."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_call_time = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            call_time = max(now, self.next_call_time)
+            self.next_call_time = call_time + self.interval
+        time.sleep(call_time - now)
+
+
+class CircuitBreaker:
+    """Stops calling the geocoder after `failure_threshold` failures in a row.
+
+    After `recovery_timeout` seconds a single trial call is let through: its
+    success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, recovery_timeout):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures_count = 0
+        self.opened_at = None
+        self.is_trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if self.is_trial_running or time.monotonic() - self.opened_at < self.recovery_timeout:
+                raise GeocoderUnavailable('Геокодер временно не вызывается после серии ошибок')
+            self.is_trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures_count = 0
+            self.opened_at = None
+            self.is_trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures_count += 1
+            if self.is_trial_running or self.failures_count >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.is_trial_running = False
+
+
+class YandexGeocoder(BaseGeocoder):
+    base_url = 'https://geocode-maps.yandex.ru/1.x'
+
+    def __init__(self, apikey, timeout=None, max_workers=1, rate_limit=None, base_url=None,
+                 circuit_breaker=None):
+        self.apikey = apikey
+        self.circuit_breaker = circuit_breaker
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate_limit)
+        if base_url:
+            self.base_url = base_url
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_settings(cls):
+        if not settings.YANDEX_GEO_TOKEN:
+            raise ImproperlyConfigured('Для геокодера Яндекса нужна переменная окружения YANDEX_GEO_TOKEN')
+        return cls(
+            settings.YANDEX_GEO_TOKEN,
+            timeout=settings.GEOCODER_TIMEOUT,
+            max_workers=settings.GEOCODER_MAX_WORKERS,
+            rate_limit=settings.GEOCODER_RATE_LIMIT,
+            circuit_breaker=CircuitBreaker(
+                settings.GEOCODER_FAILURE_THRESHOLD,
+                settings.GEOCODER_RECOVERY_TIMEOUT,
+            ),
+        )
+
+    def get_coordinates(self, address):
+        if not self.circuit_breaker:
+            return self.request_coordinates(address)
 
+        self.circuit_breaker.before_call()
+        is_successful = False
+        try:
+            coordinates = self.request_coordinates(address)
+            is_successful = True
+        finally:
+            # any error counts, otherwise a failed trial call would keep the breaker open
+            if is_successful:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+        return coordinates
 
-def get_coordinates(address):
-    apikey = settings.YANDEX_GEO_TOKEN
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": apikey,
-        "format": "json",
-    })
-    response.raise_for_status()
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+    def request_coordinates(self, address):
+        self.rate_limiter.wait()
+        response = self.session.get(self.base_url, params={
+            "geocode": address,
+            "apikey": self.apikey,
+            "format": "json",
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        try:
+            found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+            if not found_places:
+                return None
 
-    if not found_places:
-        return None
+            most_relevant = found_places[0]
+            lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as error:
+            raise InvalidGeocoderResponse(f'Неожиданный ответ геокодера на адрес {address}') from error
+        return lon, lat
 
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-    return lon, lat
+    def get_coordinates_many(self, addresses):
+        addresses = list(addresses)
+        if len(addresses) < 2 or self.max_workers < 2:
+            return super().get_coordinates_many(addresses)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(addresses))) as executor:
+            return list(executor.map(self.get_coordinates_or_error, addresses))
@@ -116,6 +116,12 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
+    list_display = [
+        '__str__',
+        'status',
+        'address',
+        'total_price',
+    ]
     inlines = [
         OrderItemInline
     ]
@@ -0,0 +1,197 @@
+import base64
+import binascii
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Product, Restaurant, RestaurantMenuItem
+from .renderers import dumps
+
+CATALOG_CACHE_KEY = 'foodcartapp:catalog'
+CATALOG_VERSION_CACHE_KEY = 'foodcartapp:catalog:version'
+CATALOG_MODIFIED_CACHE_KEY = 'foodcartapp:catalog:modified'
+PRODUCTS_VERSION_CACHE_KEY = 'foodcartapp:products:version'
+RESTAURANT_MENU_CACHE_KEY = 'foodcartapp:restaurant_menu:{restaurant_id}:{products_version}'
+RESTAURANT_MENU_VERSION_CACHE_KEY = 'foodcartapp:restaurant_menu:{restaurant_id}:version'
+CATALOG_PAGE_SIZE = 20
+MAX_CATALOG_PAGE_SIZE = 100
+
+
+def get_version(version_key):
+    version = cache.get(version_key)
+    if version is None:
+        # start from the current time, so a lost counter never repeats an old version;
+        # versions expire too, so a process missing bumps made in another one catches up
+        cache.add(version_key, int(time.time() * 1000), settings.CATALOG_CACHE_TIMEOUT)
+        version = cache.get(version_key)
+    return version
+
+
+def bump_version(version_key):
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        get_version(version_key)
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_CACHE_KEY)
+
+
+def bump_catalog_version():
+    bump_version(CATALOG_VERSION_CACHE_KEY)
+    cache.set(CATALOG_MODIFIED_CACHE_KEY, timezone.now(), None)
+    cache.delete(CATALOG_CACHE_KEY)
+
+
+def bump_products_version():
+    bump_version(PRODUCTS_VERSION_CACHE_KEY)
+
+
+def get_restaurant_menu_versions(restaurant_id):
+    return (
+        get_version(RESTAURANT_MENU_VERSION_CACHE_KEY.format(restaurant_id=restaurant_id)),
+        get_version(PRODUCTS_VERSION_CACHE_KEY),
+    )
+
+
+def invalidate_restaurant_menu(restaurant_id):
+    bump_version(RESTAURANT_MENU_VERSION_CACHE_KEY.format(restaurant_id=restaurant_id))
+    cache.delete(RESTAURANT_MENU_CACHE_KEY.format(
+        restaurant_id=restaurant_id,
+        products_version=get_version(PRODUCTS_VERSION_CACHE_KEY),
+    ))
+
+
+def serialize_product(product, restaurant=None):
+    # FIXME the catalog has no single restaurant for a product, the product itself is
+    # kept there for backward compatibility, use the restaurant menu API instead
+    restaurant = restaurant or product
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+        'restaurant': {
+            'id': restaurant.id,
+            'name': restaurant.name,
+        }
+    }
+
+
+def build_catalog():
+    products = Product.objects.select_related('category').available()
+    return [serialize_product(product) for product in products]
+
+
+def encode_catalog_cursor(product_id):
+    return base64.urlsafe_b64encode(str(product_id).encode()).decode()
+
+
+def decode_catalog_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (TypeError, UnicodeError, binascii.Error) as error:
+        raise ValueError(f'Invalid catalog cursor: {cursor}') from error
+
+
+def build_catalog_page(category=None, special=None, restaurant=None, limit=None, cursor=None):
+    products = (
+        Product.objects
+        .select_related('category')
+        .available(restaurant_id=restaurant)
+        .order_by('id')
+    )
+    if category is not None:
+        products = products.filter(category_id=category)
+    if special is not None:
+        products = products.filter(special_status=special)
+    if cursor is not None:
+        products = products.filter(id__gt=cursor)
+    if limit is None:
+        return [serialize_product(product) for product in products]
+
+    products = list(products[:limit + 1])
+    next_cursor = encode_catalog_cursor(products[limit - 1].id) if len(products) > limit else None
+    return {
+        'next': next_cursor,
+        'results': [serialize_product(product) for product in products[:limit]],
+    }
+
+
+def get_catalog_last_modified():
+    # deletions leave no updated_at behind, so the time of the last bump counts too
+    last_modified_dates = [
+        Product.objects.aggregate(last_modified=Max('updated_at'))['last_modified'],
+        RestaurantMenuItem.objects.aggregate(last_modified=Max('updated_at'))['last_modified'],
+        cache.get(CATALOG_MODIFIED_CACHE_KEY),
+    ]
+    last_modified_dates = [date for date in last_modified_dates if date]
+    if last_modified_dates:
+        return max(last_modified_dates)
+
+
+def get_catalog():
+    """Returns the catalog version, last modification date and JSON bytes."""
+    cached_catalog = cache.get(CATALOG_CACHE_KEY)
+    if cached_catalog:
+        return cached_catalog
+
+    version = get_catalog_version()
+    last_modified = get_catalog_last_modified()
+    content = dumps(build_catalog())
+    # skip caching if the menu has changed while the catalog was being built
+    if get_catalog_version() == version:
+        cache.set(CATALOG_CACHE_KEY, (version, last_modified, content), settings.CATALOG_CACHE_TIMEOUT)
+    return version, last_modified, content
+
+
+def build_restaurant_menu(restaurant):
+    menu_items = (
+        RestaurantMenuItem.objects
+        .filter(restaurant=restaurant, availability=True)
+        .select_related('product__category')
+        .order_by('product_id')
+    )
+    return {
+        'restaurant': {
+            'id': restaurant.id,
+            'name': restaurant.name,
+            'address': restaurant.address,
+            'contact_phone': restaurant.contact_phone,
+        },
+        'products': [serialize_product(item.product, restaurant) for item in menu_items],
+    }
+
+
+def get_restaurant_menu(restaurant_id):
+    """Returns a hash and JSON bytes of the restaurant menu, or None for an unknown restaurant."""
+    versions = get_restaurant_menu_versions(restaurant_id)
+    _, products_version = versions
+    cache_key = RESTAURANT_MENU_CACHE_KEY.format(
+        restaurant_id=restaurant_id,
+        products_version=products_version,
+    )
+    cached_menu = cache.get(cache_key)
+    if cached_menu:
+        return cached_menu
+
+    restaurant = Restaurant.objects.filter(pk=restaurant_id).first()
+    if not restaurant:
+        return None
+    content = dumps(build_restaurant_menu(restaurant))
+    menu = (hashlib.md5(content).hexdigest(), content)
+    # skip caching if the menu has changed while it was being built
+    if get_restaurant_menu_versions(restaurant_id) == versions:
+        cache.set(cache_key, menu, settings.CATALOG_CACHE_TIMEOUT)
+    return menu
@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from coordinates.spatial import KDTree
+
+from .catalog import bump_version, get_version
+from .models import Restaurant, RestaurantMenuItem
+
+
+class RestaurantCapabilityIndex:
+    """Maps every product id to a bitmask of restaurants that can cook it.
+
+    Bit `i` of a mask corresponds to `self.restaurants[i]`, so the restaurants
+    able to cook a whole order are the AND of its products' masks.
+    """
+
+    def __init__(self, restaurants, menu_items):
+        self.restaurants = list(restaurants)
+        restaurant_bits = {
+            restaurant.id: 1 << position
+            for position, restaurant in enumerate(self.restaurants)
+        }
+        self.all_restaurants_mask = (1 << len(self.restaurants)) - 1
+        self.product_masks = {}
+        for product_id, restaurant_id in menu_items:
+            self.product_masks[product_id] = (
+                self.product_masks.get(product_id, 0) | restaurant_bits[restaurant_id]
+            )
+
+    @classmethod
+    def build(cls):
+        menu_items = (
+            RestaurantMenuItem.objects
+            .filter(availability=True)
+            .values_list('product_id', 'restaurant_id')
+        )
+        return cls(Restaurant.objects.order_by('id'), menu_items)
+
+    def get_mask(self, product_ids):
+        mask = self.all_restaurants_mask
+        for product_id in product_ids:
+            mask &= self.product_masks.get(product_id, 0)
+            if not mask:
+                break
+        return mask
+
+    def get_positions(self, product_ids):
+        mask = self.get_mask(product_ids)
+        return [position for position in range(len(self.restaurants)) if mask >> position & 1]
+
+    def get_restaurants(self, product_ids):
+        return [self.restaurants[position] for position in self.get_positions(product_ids)]
+
+
+class RestaurantSpatialIndex:
+    """Finds the nearest restaurants able to cook all products of an order.
+
+    Restaurants are identified by their positions in the capability index,
+    the ones without known coordinates are left out of the tree.
+    """
+
+    def __init__(self, capability_index, restaurant_coordinates):
+        self.capability_index = capability_index
+        self.restaurant_coordinates = restaurant_coordinates
+        positions = [
+            position for position, coordinates in enumerate(restaurant_coordinates)
+            if coordinates
+        ]
+        self.tree = KDTree(
+            [restaurant_coordinates[position] for position in positions],
+            positions,
+        )
+
+    def get_nearest_positions(self, coordinates, product_ids, limit):
+        mask = self.capability_index.get_mask(product_ids)
+        return self.tree.query(
+            coordinates,
+            limit,
+            predicate=lambda position: mask >> position & 1,
+        )
+
+
+class AvailabilityMatrix:
+    """Product availability in restaurants sorted by name, one bitmask per product."""
+
+    def __init__(self, restaurants, menu_items):
+        self.restaurants = [
+            {'id': restaurant_id, 'name': name}
+            for restaurant_id, name in restaurants
+        ]
+        restaurant_bits = {
+            restaurant['id']: 1 << position
+            for position, restaurant in enumerate(self.restaurants)
+        }
+        self.product_masks = {}
+        for product_id, restaurant_id, availability in menu_items:
+            if availability:
+                self.product_masks[product_id] = (
+                    self.product_masks.get(product_id, 0) | restaurant_bits[restaurant_id]
+                )
+
+    @classmethod
+    def build(cls):
+        restaurants = Restaurant.objects.order_by('name').values_list('id', 'name')
+        menu_items = RestaurantMenuItem.objects.values_list('product_id', 'restaurant_id', 'availability')
+        return cls(restaurants, menu_items)
+
+    def get_row(self, product_id):
+        mask = self.product_masks.get(product_id, 0)
+        return [bool(mask >> position & 1) for position in range(len(self.restaurants))]
+
+
+AVAILABILITY_MATRIX_CACHE_KEY = 'foodcartapp:availability_matrix'
+AVAILABILITY_MATRIX_VERSION_CACHE_KEY = 'foodcartapp:availability_matrix:version'
+CAPABILITY_INDEX_VERSION_CACHE_KEY = 'foodcartapp:capability_index:version'
+
+_capability_index = None
+_capability_index_version = None
+_spatial_index = None
+
+
+def get_capability_index():
+    """Return the process-wide index, rebuilt when another process has invalidated it.
+
+    The index is kept in process memory, its version lives in the shared cache.
+    """
+    global _capability_index, _capability_index_version
+    version = get_version(CAPABILITY_INDEX_VERSION_CACHE_KEY)
+    if _capability_index is None or _capability_index_version != version:
+        _capability_index = RestaurantCapabilityIndex.build()
+        _capability_index_version = version
+    return _capability_index
+
+
+def invalidate_capability_index():
+    bump_version(CAPABILITY_INDEX_VERSION_CACHE_KEY)
+
+
+def get_spatial_index(capability_index, restaurant_coordinates):
+    global _spatial_index
+    restaurant_coordinates = tuple(restaurant_coordinates)
+    if (
+        _spatial_index is None
+        or _spatial_index.capability_index is not capability_index
+        or _spatial_index.restaurant_coordinates != restaurant_coordinates
+    ):
+        _spatial_index = RestaurantSpatialIndex(capability_index, restaurant_coordinates)
+    return _spatial_index
+
+
+def get_availability_matrix():
+    matrix = cache.get(AVAILABILITY_MATRIX_CACHE_KEY)
+    if matrix is None:
+        version = get_version(AVAILABILITY_MATRIX_VERSION_CACHE_KEY)
+        matrix = AvailabilityMatrix.build()
+        # skip caching if the menus have changed while the matrix was being built
+        if get_version(AVAILABILITY_MATRIX_VERSION_CACHE_KEY) == version:
+            cache.set(AVAILABILITY_MATRIX_CACHE_KEY, matrix, settings.CATALOG_CACHE_TIMEOUT)
+    return matrix
+
+
+def invalidate_availability_matrix():
+    bump_version(AVAILABILITY_MATRIX_VERSION_CACHE_KEY)
+    cache.delete(AVAILABILITY_MATRIX_CACHE_KEY)
@@ -0,0 +1,33 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from foodcartapp.catalog import build_catalog
+from foodcartapp.renderers import dumps, orjson
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость и размер JSON каталога у старого и быстрого рендерера'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, repeat, **options):
+        catalog = build_catalog()
+        renderers = {
+            'stdlib, indent=4': lambda: json.dumps(
+                catalog,
+                cls=DjangoJSONEncoder,
+                ensure_ascii=False,
+                indent=4,
+            ).encode(),
+            f'fast ({"orjson" if orjson else "stdlib"}), compact': lambda: dumps(catalog),
+        }
+        self.stdout.write(f'Товаров в каталоге: {len(catalog)}, повторов: {repeat}')
+        for name, render in renderers.items():
+            elapsed = timeit.timeit(render, number=repeat)
+            self.stdout.write(
+                f'{name}: {elapsed / repeat * 1000:.3f} мс, {len(render())} байт'
+            )
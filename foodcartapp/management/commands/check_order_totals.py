@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохранённые суммы заказов, которые разошлись со строками заказа'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='только показать заказы с неверной суммой',
+        )
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        checked_count = 0
+        drifted_count = 0
+        last_id = 0
+        while True:
+            orders = list(
+                Order.objects
+                .filter(pk__gt=last_id)
+                .order_by('pk')
+                .with_total_price()
+                .only('pk', 'total_price')[:batch_size]
+            )
+            if not orders:
+                break
+            last_id = orders[-1].pk
+            checked_count += len(orders)
+
+            drifted_orders = []
+            for order in orders:
+                calculated_price = order.items_total_price or 0
+                if order.total_price != calculated_price:
+                    self.stdout.write(f'Заказ {order.pk}: {order.total_price} -> {calculated_price}')
+                    order.total_price = calculated_price
+                    drifted_orders.append(order)
+            drifted_count += len(drifted_orders)
+            if not dry_run:
+                Order.objects.bulk_update(drifted_orders, ['total_price'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено заказов: {checked_count}, с неверной суммой: {drifted_count}'
+        ))
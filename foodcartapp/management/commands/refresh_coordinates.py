@@ -0,0 +1,79 @@
+import argparse
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from coordinates.addresses import normalize_address
+from coordinates.models import PlaceCoordinates
+from foodcartapp.models import Order, Restaurant
+
+
+def parse_since(value):
+    since = parse_datetime(value)
+    if since is None:
+        date = parse_date(value)
+        if date is None:
+            raise argparse.ArgumentTypeError('Ожидается дата в формате ГГГГ-ММ-ДД или ГГГГ-ММ-ДД ЧЧ:ММ')
+        since = datetime.datetime.combine(date, datetime.time())
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса заказов и ресторанов без координат или с устаревшими координатами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--since',
+            type=parse_since,
+            help='брать только адреса заказов, созданных начиная с этой даты',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='только посчитать адреса, которые нужно геокодировать',
+        )
+
+    def handle(self, *args, batch_size, since, dry_run, **options):
+        orders = Order.objects.all()
+        if since:
+            orders = orders.filter(created_at__gte=since)
+        addresses = set(orders.values_list('address', flat=True).distinct())
+        addresses.update(Restaurant.objects.values_list('address', flat=True))
+        normalized_addresses = {normalize_address(address) for address in addresses if address}
+
+        if dry_run:
+            known_addresses = set(PlaceCoordinates.objects.values_list('normalized_address', flat=True))
+            missing_count = len(normalized_addresses - known_addresses)
+        else:
+            # new addresses become pending places and are picked up below
+            missing_count = 0
+            PlaceCoordinates.objects.enqueue(addresses)
+
+        refreshed_places = PlaceCoordinates.objects.pending() | PlaceCoordinates.objects.stale()
+        place_ids = [
+            place_id
+            for place_id, normalized_address in refreshed_places.values_list('pk', 'normalized_address')
+            if normalized_address in normalized_addresses
+        ]
+        total_count = missing_count + len(place_ids)
+        self.stdout.write(f'Адресов: {len(normalized_addresses)}, нужно геокодировать: {total_count}')
+        if dry_run:
+            return
+
+        processed_count = 0
+        failed_count = 0
+        for start in range(0, len(place_ids), batch_size):
+            batch_ids = place_ids[start:start + batch_size]
+            failed_places = PlaceCoordinates.objects.filter(pk__in=batch_ids).geocode()
+            processed_count += len(batch_ids)
+            failed_count += len(failed_places)
+            self.stdout.write(f'Обработано {processed_count} из {total_count}, не удалось: {failed_count}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Геокодировано адресов: {processed_count - failed_count}, не удалось: {failed_count}'
+        ))
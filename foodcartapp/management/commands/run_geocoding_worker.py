@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from coordinates.models import PlaceCoordinates
+from foodcartapp.models import Restaurant
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса новых заказов и обновляет устаревшие координаты ресторанов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Пауза между проверками очереди, в секундах',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь один раз и выйти',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            restaurant_addresses = list(Restaurant.objects.values_list('address', flat=True))
+            PlaceCoordinates.objects.enqueue(restaurant_addresses)
+            places = (
+                PlaceCoordinates.objects.pending()
+                | PlaceCoordinates.objects.for_addresses(restaurant_addresses).stale()
+            ).retry_due()
+
+            failed_places = places.geocode()
+            if places:
+                self.stdout.write(
+                    f'Обработано адресов: {len(places)}, не удалось геокодировать: {len(failed_places)}'
+                )
+
+            if options['once']:
+                return
+            time.sleep(options['interval'])
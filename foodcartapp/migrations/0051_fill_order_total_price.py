@@ -0,0 +1,33 @@
+# Generated by Django 3.2.15 on 2026-10-18 11:52
+
+from django.db import migrations
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_total_price_for_old_orders(apps, schema_editor):
+    order_model = apps.get_model('foodcartapp', 'Order')
+    order_item_model = apps.get_model('foodcartapp', 'OrderItems')
+    items_total_price = (
+        order_item_model.objects
+        .filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total_price=Sum(F('quantity') * F('price')))
+        .values('total_price')
+    )
+    order_model.objects.update(total_price=Coalesce(
+        Subquery(items_total_price),
+        Value(0),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0050_order_total_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_total_price_for_old_orders, migrations.RunPython.noop)
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.15 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0053_catalog_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurantmenuitem',
+            index=models.Index(fields=['product', 'availability'], name='foodcartapp_product_71ea38_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0055_order_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='request_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='хеш запроса'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 import datetime
 
+from django.conf import settings
 from django.db import models
-from django.db.models import F, Sum
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
@@ -32,13 +34,11 @@ class Restaurant(models.Model):
 
 
 class ProductQuerySet(models.QuerySet):
-    def available(self):
-        products = (
-            RestaurantMenuItem.objects
-            .filter(availability=True)
-            .values_list('product')
-        )
-        return self.filter(pk__in=products)
+    def available(self, restaurant_id=None):
+        menu_items = RestaurantMenuItem.objects.filter(availability=True)
+        if restaurant_id is not None:
+            menu_items = menu_items.filter(restaurant_id=restaurant_id)
+        return self.filter(pk__in=menu_items.values_list('product'))
 
 
 class ProductCategory(models.Model):
@@ -87,6 +87,11 @@ class Product(models.Model):
         max_length=200,
         blank=True,
     )
+    updated_at = models.DateTimeField(
+        'дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
 
     objects = ProductQuerySet.as_manager()
 
@@ -116,6 +121,11 @@ class RestaurantMenuItem(models.Model):
         default=True,
         db_index=True
     )
+    updated_at = models.DateTimeField(
+        'дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'пункт меню ресторана'
@@ -123,11 +133,33 @@ class RestaurantMenuItem(models.Model):
         unique_together = [
             ['restaurant', 'product']
         ]
+        indexes = [
+            models.Index(fields=['product', 'availability']),
+        ]
 
     def __str__(self):
         return f"{self.restaurant.name} - {self.product.name}"
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_total_price(self):
+        return self.annotate(items_total_price=Sum(F('items__quantity') * F('items__price')))
+
+    def update_total_price(self):
+        items_total_price = (
+            OrderItems.objects
+            .filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(total_price=Sum(F('quantity') * F('price')))
+            .values('total_price')
+        )
+        return self.update(total_price=Coalesce(
+            Subquery(items_total_price),
+            Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ))
+
+
 class Order(models.Model):
     DELIVERED = 'D'
     IN_PROGRESS = 'P'
@@ -178,14 +210,60 @@ class Order(models.Model):
     )
     called_at = models.DateTimeField(verbose_name='Дата звонка', blank=True, null=True)
     delivered_at = models.DateTimeField(verbose_name='Дата доставки', blank=True, null=True)
+    total_price = models.DecimalField(
+        verbose_name='Сумма',
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        db_index=True,
+    )
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        # total_price is maintained by OrderItems writes, an instance loaded before
+        # its items changed must not write the old sum back
+        is_total_price_skipped = not self._state.adding and not force_insert and update_fields is None
+        if is_total_price_skipped:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'total_price'
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+        if is_total_price_skipped:
+            self.refresh_from_db(using=using, fields=['total_price'])
+
+
+class OrderItemsQuerySet(models.QuerySet):
+    def _update_orders_total_price(self, order_ids):
+        Order.objects.filter(pk__in=set(order_ids)).update_total_price()
 
-    def price(self):
-        order_price = self.items.aggregate(total_price=Sum(F('quantity')*F('price'))).get('total_price')
-        return order_price
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self._update_orders_total_price(obj.order_id for obj in objs)
+        return objs
+
+    def update(self, **kwargs):
+        # bulk_update() also ends up here, once per batch
+        order_ids_by_item = dict(self.values_list('pk', 'order_id'))
+        rows = super().update(**kwargs)
+        order_ids = list(order_ids_by_item.values())
+        if 'order' in kwargs or 'order_id' in kwargs:
+            order_ids += (
+                OrderItems.objects
+                .filter(pk__in=order_ids_by_item)
+                .values_list('order_id', flat=True)
+            )
+        self._update_orders_total_price(order_ids)
+        return rows
 
 
 class OrderItems(models.Model):
@@ -212,7 +290,48 @@ class OrderItems(models.Model):
         validators=[MinValueValidator(0)]
     )
 
+    objects = OrderItemsQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Строка заказа'
         verbose_name_plural = 'Строки заказа'
 
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self):
+        lifetime = datetime.timedelta(hours=settings.IDEMPOTENCY_KEY_LIFETIME)
+        return self.filter(created_at__lt=timezone.now() - lifetime)
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(
+        'ключ',
+        max_length=255,
+        unique=True,
+    )
+    request_hash = models.CharField(
+        'хеш запроса',
+        max_length=64,
+        blank=True,
+    )
+    response_status = models.PositiveSmallIntegerField('код ответа')
+    response_data = models.JSONField('ответ')
+    created_at = models.DateTimeField(
+        'дата создания',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return self.key
+
+    @property
+    def is_expired(self):
+        lifetime = datetime.timedelta(hours=settings.IDEMPOTENCY_KEY_LIFETIME)
+        return timezone.now() - self.created_at >= lifetime
@@ -0,0 +1,46 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def is_pretty_requested(request):
+    return request is not None and request.GET.get('pretty') == '1'
+
+
+def dumps(data, pretty=False):
+    """Serializes data to compact JSON bytes, or indented ones when `pretty` is set.
+
+    Decimal prices, dates and lazy translations are encoded the same way
+    as Django's JsonResponse does it, non-string dict keys are turned into strings.
+    """
+    if orjson:
+        # dates go through DjangoJSONEncoder too, orjson's own format differs from it
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=DjangoJSONEncoder().default, option=option)
+    return json.dumps(
+        data,
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        indent=2 if pretty else None,
+        separators=None if pretty else (',', ':'),
+    ).encode()
+
+
+class FastJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        request = (renderer_context or {}).get('request')
+        return dumps(data, pretty=is_pretty_requested(request))
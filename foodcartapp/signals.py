@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .catalog import bump_catalog_version, bump_products_version, invalidate_restaurant_menu
+from .indexes import invalidate_availability_matrix, invalidate_capability_index
+from .models import Order, OrderItems, Product, ProductCategory, Restaurant, RestaurantMenuItem
+
+# bulk_create sends no post_save, so bulk order ingestion reports new orders with this one
+orders_bulk_created = Signal()
+
+
+def reset_menu_caches(restaurant_ids):
+    invalidate_capability_index()
+    invalidate_availability_matrix()
+    bump_catalog_version()
+    for restaurant_id in set(restaurant_ids):
+        invalidate_restaurant_menu(restaurant_id)
+
+
+def reset_restaurant_caches(restaurant_id):
+    invalidate_capability_index()
+    invalidate_availability_matrix()
+    invalidate_restaurant_menu(restaurant_id)
+
+
+def reset_product_caches():
+    bump_catalog_version()
+    bump_products_version()
+
+
+# caches are reset after commit, otherwise a request made before the commit would
+# cache the old rows under the new version and keep serving them
+
+
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def reset_menu_caches_by_item(sender, instance, **kwargs):
+    restaurant_id = instance.restaurant_id
+    transaction.on_commit(lambda: reset_menu_caches([restaurant_id]))
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def reset_caches_by_restaurant(sender, instance, **kwargs):
+    restaurant_id = instance.id
+    transaction.on_commit(lambda: reset_restaurant_caches(restaurant_id))
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductCategory)
+def reset_caches_by_product(sender, **kwargs):
+    transaction.on_commit(reset_product_caches)
+
+
+@receiver([post_save, post_delete], sender=OrderItems)
+def update_order_total_price(sender, instance, **kwargs):
+    Order.objects.filter(pk=instance.order_id).update_total_price()
@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from .models import Order, OrderItems, Product
+
+
+class OrderTotalPriceTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Бургер', price=Decimal('100.00'), image='burger.png')
+        self.order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79991234567',
+            address='Москва, ул. Ленина 1',
+        )
+        self.item = OrderItems.objects.create(
+            order=self.order,
+            product=self.product,
+            quantity=6,
+            price=Decimal('100.00'),
+        )
+
+    def test_total_price_follows_items(self):
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, Decimal('600.00'))
+
+    def test_stale_order_does_not_overwrite_total_price(self):
+        stale_order = Order.objects.get(pk=self.order.pk)
+        self.item.quantity = 2
+        self.item.save()
+
+        stale_order.comment = 'Позвонить заранее'
+        stale_order.save()
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, Decimal('200.00'))
+        self.assertEqual(self.order.comment, 'Позвонить заранее')
+        self.assertEqual(stale_order.total_price, Decimal('200.00'))
@@ -1,6 +1,12 @@
 from django.urls import path
 
-from .views import product_list_api, banners_list_api, register_order
+from .views import (
+    banners_list_api,
+    product_list_api,
+    register_order,
+    register_orders_bulk,
+    restaurant_menu_api,
+)
 
 
 app_name = "foodcartapp"
@@ -8,5 +14,7 @@ app_name = "foodcartapp"
 urlpatterns = [
     path('products/', product_list_api),
     path('banners/', banners_list_api),
+    path('restaurants/<int:restaurant_id>/menu/', restaurant_menu_api),
     path('order/', register_order),
+    path('orders/bulk/', register_orders_bulk),
 ]
@@ -1,11 +1,92 @@
-from django.db import transaction
-from django.http import JsonResponse
+import hashlib
+import json
+from functools import lru_cache, wraps
+
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag, urlencode
 from django.templatetags.static import static
 
-from .models import Product, Order, OrderItems
+from coordinates.models import PlaceCoordinates
+
+from .catalog import (
+    CATALOG_PAGE_SIZE,
+    MAX_CATALOG_PAGE_SIZE,
+    build_catalog_page,
+    decode_catalog_cursor,
+    get_catalog,
+    get_catalog_version,
+    get_restaurant_menu,
+)
+from .models import IdempotencyKey, Product, Order, OrderItems
+from .renderers import dumps, is_pretty_requested
+from .signals import orders_bulk_created
+from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rest_framework.serializers import ModelSerializer, ValidationError
+from rest_framework.serializers import (
+    BooleanField,
+    CharField,
+    IntegerField,
+    ModelSerializer,
+    Serializer,
+    ValidationError,
+)
+
+MAX_BULK_ORDERS = 500
+
+
+def idempotent(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({'Idempotency-Key': ['Слишком длинный ключ идемпотентности.']})
+
+        request_hash = get_request_hash(request)
+        stored_key = IdempotencyKey.objects.filter(key=key).first()
+        if stored_key and stored_key.is_expired:
+            stored_key.delete()
+        elif stored_key:
+            return replay_response(stored_key, request_hash)
+
+        try:
+            with transaction.atomic():
+                response = view(request, *args, **kwargs)
+                IdempotencyKey.objects.create(
+                    key=key,
+                    request_hash=request_hash,
+                    response_status=response.status_code,
+                    response_data=response.data,
+                )
+        except IntegrityError:
+            # a concurrent request with the same key has committed first
+            stored_key = IdempotencyKey.objects.filter(key=key).first()
+            if not stored_key:
+                raise
+            return replay_response(stored_key, request_hash)
+        return response
+    return wrapper
+
+
+def get_request_hash(request):
+    canonical_data = json.dumps(request.data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical_data.encode()).hexdigest()
+
+
+def replay_response(stored_key, request_hash):
+    # keys stored before request hashes were kept have an empty hash
+    if stored_key.request_hash and stored_key.request_hash != request_hash:
+        return Response(
+            {'Idempotency-Key': ['Ключ уже использован с другим телом запроса.']},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(stored_key.response_data, status=stored_key.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
 
 
 class OrderSerializer(ModelSerializer):
@@ -14,20 +95,60 @@ class OrderSerializer(ModelSerializer):
         fields = ['id', 'firstname', 'lastname', 'phonenumber', 'address']
 
     def validate_order(self, order_items):
+        validated_items = self.check_items(order_items)
+        products = Product.objects.in_bulk({item['product'] for item in validated_items})
+        return self.bind_products(validated_items, products)
+
+    def check_items(self, order_items):
         self.is_valid(raise_exception=True)
         item_serializer = OrderItemSerializer(data=order_items, many=True, allow_empty=False)
         item_serializer.is_valid(raise_exception=True)
+        return item_serializer.validated_data
+
+    @staticmethod
+    def bind_products(validated_items, products):
+        unknown_product_ids = {item['product'] for item in validated_items} - products.keys()
+        if unknown_product_ids:
+            raise ValidationError({'products': [
+                f'Недопустимый первичный ключ "{product_id}" - объект не существует.'
+                for product_id in sorted(unknown_product_ids)
+            ]})
+        return [
+            {'product': products[item['product']], 'quantity': item['quantity']}
+            for item in validated_items
+        ]
+
+
+class CatalogFiltersSerializer(Serializer):
+    category = IntegerField(required=False)
+    special = BooleanField(required=False)
+    restaurant = IntegerField(required=False)
+    limit = IntegerField(required=False, min_value=1, max_value=MAX_CATALOG_PAGE_SIZE)
+    cursor = CharField(required=False)
+
+    def validate_cursor(self, cursor):
+        try:
+            return decode_catalog_cursor(cursor)
+        except ValueError:
+            raise ValidationError('Неверный курсор.')
+
+    def validate(self, filters):
+        if 'cursor' in filters:
+            filters.setdefault('limit', CATALOG_PAGE_SIZE)
+        return filters
 
 
 class OrderItemSerializer(ModelSerializer):
+    product = IntegerField()
+
     class Meta:
         model = OrderItems
         fields = ['product', 'quantity']
 
 
-def banners_list_api(request):
+def get_banners():
     # FIXME move data to db?
-    return JsonResponse([
+    banners = [
         {
             'title': 'Burger',
             'src': static('burger.jpg'),
@@ -43,63 +164,154 @@ def banners_list_api(request):
             'src': static('tasty.jpg'),
             'text': 'Food is incomplete without a tasty dessert',
         }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    ]
+    return banners
+
+
+@lru_cache(maxsize=None)
+def get_banners_content():
+    content = dumps(get_banners())
+    return hashlib.md5(content).hexdigest(), content
+
+
+def conditional_json_response(request, get_content, etag, last_modified=None):
+    pretty = is_pretty_requested(request)
+    if pretty:
+        etag = f'{etag}-pretty'
+    etag = quote_etag(etag)
+    last_modified_timestamp = last_modified and int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified_timestamp)
+    if response is None:
+        content = get_content()
+        if pretty:
+            content = dumps(json.loads(content), pretty=True)
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified_timestamp)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def banners_list_api(request):
+    banners_hash, content = get_banners_content()
+    return conditional_json_response(request, lambda: content, etag=f'banners-{banners_hash}')
 
 
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    if not request.GET.keys() - {'pretty'}:
+        version, last_modified, content = get_catalog()
+        return conditional_json_response(
+            request,
+            lambda: content,
+            etag=f'catalog-{version}',
+            last_modified=last_modified,
+        )
+
+    filters_serializer = CatalogFiltersSerializer(data=request.GET.dict())
+    if not filters_serializer.is_valid():
+        return HttpResponse(dumps(filters_serializer.errors), status=400, content_type='application/json')
+    filters = filters_serializer.validated_data
+    # the catalog version covers every change, so filtered pages are revalidated without the ORM
+    filters_hash = hashlib.md5(urlencode(sorted(filters.items())).encode()).hexdigest()
+    return conditional_json_response(
+        request,
+        lambda: dumps(build_catalog_page(**filters)),
+        etag=f'catalog-{get_catalog_version()}-{filters_hash}',
+    )
+
+
+def restaurant_menu_api(request, restaurant_id):
+    menu = get_restaurant_menu(restaurant_id)
+    if not menu:
+        return HttpResponse(dumps({'detail': 'Ресторан не найден.'}), status=404, content_type='application/json')
+    menu_hash, content = menu
+    return conditional_json_response(request, lambda: content, etag=f'menu-{menu_hash}')
 
 
 @api_view(['POST'])
+@idempotent
 @transaction.atomic
 def register_order(request):
     order_serializer = OrderSerializer(data=request.data)
-    order_serializer.validate_order(request.data.get('products'))
+    validated_items = order_serializer.validate_order(request.data.get('products'))
 
     order = Order.objects.create(
-        firstname=request.data['firstname'],
-        lastname=request.data['lastname'],
-        phonenumber=request.data['phonenumber'],
-        address=request.data['address']
+        **order_serializer.validated_data,
+        total_price=sum(item['product'].price * item['quantity'] for item in validated_items)
     )
-    order_items = []
-    for order_item in request.data['products']:
-        product = Product.objects.get(id=order_item['product'])
-        order_items.append(
-            OrderItems(
-                order=order,
-                product=product,
-                quantity=order_item['quantity'],
-                price=product.price
-            )
+    order_items = [
+        OrderItems(
+            order=order,
+            product=item['product'],
+            quantity=item['quantity'],
+            price=item['product'].price
         )
+        for item in validated_items
+    ]
     OrderItems.objects.bulk_create(order_items)
+    transaction.on_commit(lambda: PlaceCoordinates.objects.enqueue([order.address]))
     return Response(OrderSerializer(order).data)
 
+
+@api_view(['POST'])
+@transaction.atomic
+def register_orders_bulk(request):
+    if not isinstance(request.data, list) or not request.data:
+        raise ValidationError('Ожидается непустой список заказов.')
+    if len(request.data) > MAX_BULK_ORDERS:
+        raise ValidationError(f'Нельзя передать больше {MAX_BULK_ORDERS} заказов за раз.')
+
+    results = [{'index': index} for index in range(len(request.data))]
+    serializers = {}
+    validated_items = {}
+    for index, order_data in enumerate(request.data):
+        order_serializer = OrderSerializer(data=order_data)
+        order_items = order_data.get('products') if isinstance(order_data, dict) else None
+        try:
+            validated_items[index] = order_serializer.check_items(order_items)
+        except ValidationError as error:
+            results[index]['errors'] = error.detail
+        serializers[index] = order_serializer
+
+    products = Product.objects.in_bulk({
+        item['product'] for items in validated_items.values() for item in items
+    })
+    orders = {}
+    for index, items in list(validated_items.items()):
+        try:
+            validated_items[index] = OrderSerializer.bind_products(items, products)
+        except ValidationError as error:
+            results[index]['errors'] = error.detail
+            del validated_items[index]
+            continue
+        orders[index] = Order(
+            **serializers[index].validated_data,
+            total_price=sum(item['product'].price * item['quantity'] for item in validated_items[index])
+        )
+
+    if connection.features.can_return_rows_from_bulk_insert:
+        Order.objects.bulk_create(orders.values())
+        orders_bulk_created.send(sender=Order, orders=list(orders.values()))
+    else:
+        for order in orders.values():
+            order.save()
+
+    OrderItems.objects.bulk_create([
+        OrderItems(
+            order=orders[index],
+            product=item['product'],
+            quantity=item['quantity'],
+            price=item['product'].price
+        )
+        for index, items in validated_items.items()
+        for item in items
+    ])
+
+    order_addresses = [order.address for order in orders.values()]
+    transaction.on_commit(lambda: PlaceCoordinates.objects.enqueue(order_addresses))
+
+    for index, order in orders.items():
+        results[index]['order'] = OrderSerializer(order).data
+    response_status = status.HTTP_200_OK if orders else status.HTTP_400_BAD_REQUEST
+    return Response(results, status=response_status)
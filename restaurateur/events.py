@@ -0,0 +1,67 @@
+import queue
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class InProcessEventBus:
+    """Delivers order events to subscribers living in the same process.
+
+    It is enough for a single-process server. With several processes set
+    ORDER_EVENTS_BACKEND to a class with the same interface backed by a broker.
+    """
+
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+
+    def publish(self, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                # a slow client loses events instead of blocking the publisher
+                pass
+
+    def subscribe(self):
+        subscription = Subscription(self, self.max_queue_size)
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+
+class Subscription(queue.Queue):
+    def __init__(self, bus, max_queue_size):
+        super().__init__(maxsize=max_queue_size)
+        self.bus = bus
+
+    def get_event(self, timeout):
+        try:
+            return self.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+_event_bus = None
+
+
+def get_event_bus():
+    global _event_bus
+    if _event_bus is None:
+        _event_bus = import_string(settings.ORDER_EVENTS_BACKEND)()
+    return _event_bus
+
+
+def publish_order_event(event_type, order_data):
+    get_event_bus().publish({'type': event_type, 'order': order_data})
@@ -0,0 +1,84 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from foodcartapp.models import Order, OrderItems
+from foodcartapp.signals import orders_bulk_created
+
+from .events import publish_order_event
+
+
+def serialize_order(order):
+    return {
+        'id': order.id,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'restaurant': str(order.restaurant) if order.restaurant_id else None,
+        'total_price': str(order.total_price),
+    }
+
+
+def publish_on_commit(event_type, order):
+    order_data = serialize_order(order)
+    transaction.on_commit(lambda: publish_order_event(event_type, order_data))
+
+
+@receiver(post_init, sender=Order)
+def remember_order_state(sender, instance, **kwargs):
+    # read __dict__ directly, so deferred fields are not loaded one query per order
+    instance._saved_status = instance.__dict__.get('status')
+    instance._saved_restaurant_id = instance.__dict__.get('restaurant_id')
+
+
+@receiver(post_save, sender=Order)
+def publish_order_changes(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit('order_created', instance)
+    else:
+        if instance.status != instance._saved_status:
+            publish_on_commit('order_status_changed', instance)
+        if instance.restaurant_id != instance._saved_restaurant_id and instance.restaurant_id:
+            publish_on_commit('order_restaurant_assigned', instance)
+    remember_order_state(sender, instance)
+
+
+@receiver(orders_bulk_created)
+def publish_bulk_created_orders(sender, orders, **kwargs):
+    for order in orders:
+        publish_on_commit('order_created', order)
+
+
+class ChangedOrdersBatch:
+    """Collects orders whose items changed in a transaction, to announce each once."""
+
+    def __init__(self):
+        self.order_ids = set()
+        self.is_pending = True
+
+    def publish(self):
+        # every change registers this hook, the first one to run announces the whole batch
+        if not self.is_pending:
+            return
+        self.is_pending = False
+        orders = Order.objects.select_related('restaurant').filter(pk__in=self.order_ids)
+        for order in orders:
+            publish_order_event('order_items_changed', serialize_order(order))
+
+
+_changed_orders = threading.local()
+
+
+def schedule_order_items_event(order_id):
+    batch = getattr(_changed_orders, 'batch', None)
+    # a batch left pending by a rollback is reused too, its orders are only announced once more
+    if batch is None or not batch.is_pending or not transaction.get_connection().in_atomic_block:
+        batch = _changed_orders.batch = ChangedOrdersBatch()
+    batch.order_ids.add(order_id)
+    transaction.on_commit(batch.publish)
+
+
+@receiver([post_save, post_delete], sender=OrderItems)
+def publish_order_items_changes(sender, instance, **kwargs):
+    schedule_order_items_event(instance.order_id)
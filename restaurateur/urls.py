@@ -9,11 +9,14 @@ urlpatterns = [
     path('', lambda request: redirect('restaurateur:ProductsView')),
 
     path('products/', views.view_products, name="ProductsView"),
+    path('products/availability/', views.update_products_availability, name="update_products_availability"),
 
     path('restaurants/', views.view_restaurants, name="RestaurantView"),
 
     # TODO заглушка для нереализованного функционала
     path('orders/', views.view_orders, name="view_orders"),
+    path('orders/events/', views.order_events, name="order_events"),
+    path('orders/<int:order_id>/row/', views.view_order_row, name="view_order_row"),
 
     path('login/', views.LoginView.as_view(), name="login"),
     path('logout/', views.LogoutView.as_view(), name="logout"),
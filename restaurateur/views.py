@@ -1,3 +1,6 @@
+import json
+import time
+from functools import wraps
 from operator import itemgetter
 
 from django import forms
@@ -5,14 +8,35 @@ from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views import View
-from geopy import distance
+from django.views.decorators.http import require_POST
+import numpy as np
 
+from coordinates.distance import DistanceEngine
 from coordinates.models import PlaceCoordinates
-from foodcartapp.models import Product, Restaurant, Order, RestaurantMenuItem, OrderItems
-import requests
+from foodcartapp.indexes import get_availability_matrix, get_capability_index, get_spatial_index
+from foodcartapp.models import Product, Restaurant, RestaurantMenuItem, Order
+from foodcartapp.renderers import dumps
+from foodcartapp.signals import reset_menu_caches
+
+from .events import get_event_bus
+
+
+ORDERS_PAGE_SIZE = 100
+MAX_ORDERS_PAGE_SIZE = 500
+ORDERS_STREAM_CHUNK_SIZE = 20
+ORDER_ROWS_MARKER = '<!-- order rows -->'
+ORDER_EVENTS_HEARTBEAT_INTERVAL = 15
+ORDER_EVENTS_RECONNECT_DELAY = 3000
+
 
 class Login(forms.Form):
     username = forms.CharField(
@@ -62,37 +86,109 @@ class LogoutView(auth_views.LogoutView):
     next_page = reverse_lazy('restaurateur:login')
 
 
-def fetch_coordinates(address):
-    place_coordinates, _ = PlaceCoordinates.objects.get_or_create(address=address)
-    try:
-        place_coordinates.fill_coordinates()
-    except requests.RequestException:
-        pass
-    if place_coordinates.is_coordinates_filled:
-        return (place_coordinates.latitude, place_coordinates.longitude)
-
-
 def is_manager(user):
     return user.is_staff  # FIXME replace with specific permission
 
 
+def manager_required_json(view):
+    # a redirect to the login page would look like a successful save to fetch()
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_manager(request.user):
+            return JsonResponse({'error': 'Войдите как менеджер, чтобы сохранить изменения.'}, status=403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-
-    products_with_restaurant_availability = []
-    for product in products:
-        availability = {item.restaurant_id: item.availability for item in product.menu_items.all()}
-        ordered_availability = [availability.get(restaurant.id, False) for restaurant in restaurants]
+    availability_matrix = get_availability_matrix()
+    products = Product.objects.select_related('category')
 
-        products_with_restaurant_availability.append(
-            (product, ordered_availability)
-        )
+    products_with_restaurant_availability = [
+        (product, availability_matrix.get_row(product.id))
+        for product in products
+    ]
 
     return render(request, template_name="products_list.html", context={
         'products_with_restaurant_availability': products_with_restaurant_availability,
-        'restaurants': restaurants,
+        'restaurants': availability_matrix.restaurants,
+    })
+
+
+@manager_required_json
+@require_POST
+def update_products_availability(request):
+    try:
+        changes = json.loads(request.body)['changes']
+        if not all(isinstance(change['availability'], bool) for change in changes):
+            raise ValueError('availability must be a boolean')
+        changes = {
+            (int(change['product']), int(change['restaurant'])): change['availability']
+            for change in changes
+        }
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'error': 'Неверный формат изменений.'}, status=400)
+
+    product_ids = {product_id for product_id, _ in changes}
+    restaurant_ids = {restaurant_id for _, restaurant_id in changes}
+    if (
+        Product.objects.filter(pk__in=product_ids).count() != len(product_ids)
+        or Restaurant.objects.filter(pk__in=restaurant_ids).count() != len(restaurant_ids)
+    ):
+        return JsonResponse({'error': 'Товар или ресторан не найден.'}, status=400)
+
+    with transaction.atomic():
+        menu_items = (
+            RestaurantMenuItem.objects
+            .select_for_update()
+            .filter(product__in=product_ids, restaurant__in=restaurant_ids)
+        )
+        menu_items = {(item.product_id, item.restaurant_id): item for item in menu_items}
+
+        now = timezone.now()
+        updated_items = []
+        created_items = []
+        for (product_id, restaurant_id), availability in changes.items():
+            menu_item = menu_items.get((product_id, restaurant_id))
+            if not menu_item:
+                created_items.append(RestaurantMenuItem(
+                    product_id=product_id,
+                    restaurant_id=restaurant_id,
+                    availability=availability,
+                ))
+            elif menu_item.availability != availability:
+                menu_item.availability = availability
+                menu_item.updated_at = now
+                updated_items.append(menu_item)
+
+        # a concurrent save may have created some of these rows, they are updated below
+        RestaurantMenuItem.objects.bulk_create(created_items, ignore_conflicts=True)
+        if created_items:
+            created_items_keys = {(item.product_id, item.restaurant_id) for item in created_items}
+            existing_items = (
+                RestaurantMenuItem.objects
+                .select_for_update()
+                .filter(
+                    product__in={product_id for product_id, _ in created_items_keys},
+                    restaurant__in={restaurant_id for _, restaurant_id in created_items_keys},
+                )
+            )
+            for menu_item in existing_items:
+                key = (menu_item.product_id, menu_item.restaurant_id)
+                if key in created_items_keys and menu_item.availability != changes[key]:
+                    menu_item.availability = changes[key]
+                    menu_item.updated_at = now
+                    updated_items.append(menu_item)
+        RestaurantMenuItem.objects.bulk_update(updated_items, ['availability', 'updated_at'])
+        # bulk operations send no signals, so caches are reset once for the whole batch
+        changed_restaurant_ids = [item.restaurant_id for item in updated_items + created_items]
+        if changed_restaurant_ids:
+            transaction.on_commit(lambda: reset_menu_caches(changed_restaurant_ids))
+
+    return JsonResponse({
+        'updated': len(updated_items),
+        'created': len(created_items),
     })
 
 
@@ -103,33 +199,200 @@ def view_restaurants(request):
     })
 
 
-@user_passes_test(is_manager, login_url='restaurateur:login')
-def view_orders(request):
-    orders = Order.objects.prefetch_related('items').exclude(status=Order.DELIVERED)
-    products_from_orders = OrderItems.objects.filter(order__in=orders).values_list('product', flat=True)
-    restaurant_menu_items = RestaurantMenuItem.objects.filter(product__in=products_from_orders, availability=True)
-    products_in_restaurants = {}
-    for menu_item in restaurant_menu_items:
-        products_in_restaurants.setdefault(menu_item.restaurant, set()).add(menu_item.product)
-
-    for order in orders:
-        order_coordinates = fetch_coordinates(order.address)
-        order.available_restaurants = []
-        for restaurant, restaurant_products in products_in_restaurants.items():
-            products_in_order = {item.product for item in order.items.all()}
-            if products_in_order.issubset(restaurant_products):
-                restaurant_coordinates = fetch_coordinates(restaurant.address)
-                distance_to_restaurant = 0
-                if restaurant_coordinates and order_coordinates:
-                    distance_to_restaurant = distance.distance(order_coordinates, restaurant_coordinates).m
-                order.available_restaurants.append(
-                    {
-                        'restaurant': restaurant,
-                        'distance': distance_to_restaurant
-                    }
+class RestaurantMatcher:
+    def __init__(self, restaurants_limit=None):
+        self.capability_index = get_capability_index()
+        self.restaurants_limit = restaurants_limit
+
+        restaurant_addresses = [restaurant.address for restaurant in self.capability_index.restaurants]
+        coordinates = PlaceCoordinates.objects.resolve(restaurant_addresses)
+        restaurant_coordinates = [coordinates.get(address) for address in restaurant_addresses]
+        self.restaurant_points = np.array([
+            point or (np.nan, np.nan) for point in restaurant_coordinates
+        ], dtype=float).reshape(-1, 2)
+        self.distance_engine = DistanceEngine()
+        if restaurants_limit is not None:
+            self.spatial_index = get_spatial_index(self.capability_index, restaurant_coordinates)
+
+    def get_positions(self, order_coordinates, products_in_order):
+        if self.restaurants_limit is None:
+            return self.capability_index.get_positions(products_in_order)
+        if order_coordinates:
+            return self.spatial_index.get_nearest_positions(
+                order_coordinates,
+                products_in_order,
+                self.restaurants_limit,
+            )
+        return self.capability_index.get_positions(products_in_order)[:self.restaurants_limit]
+
+    def match(self, orders):
+        coordinates = PlaceCoordinates.objects.resolve(order.address for order in orders)
+        for order in orders:
+            order_coordinates = coordinates.get(order.address)
+            products_in_order = {item.product_id for item in order.items.all()}
+            positions = self.get_positions(order_coordinates, products_in_order)
+
+            distances = np.zeros(len(positions))
+            if order_coordinates:
+                distances = np.nan_to_num(
+                    self.distance_engine.get_distances(order_coordinates, self.restaurant_points[positions])
                 )
+            order.available_restaurants = [
+                {
+                    'restaurant': self.capability_index.restaurants[position],
+                    'distance': distance_to_restaurant
+                }
+                for position, distance_to_restaurant in zip(positions, distances.tolist())
+            ]
             order.available_restaurants.sort(key=itemgetter('distance'))
+        return orders
 
-    return render(request, template_name='order_items.html', context={
-        'order_items': orders
-    })
+
+class OrdersFilter(forms.Form):
+    status = forms.ChoiceField(
+        label='Статус',
+        required=False,
+        choices=[('', 'Все необработанные')] + [
+            choice for choice in Order.STATUS_CHOICES if choice[0] != Order.DELIVERED
+        ],
+    )
+    payment_method = forms.ChoiceField(
+        label='Способ оплаты',
+        required=False,
+        choices=[('', 'Любой')] + Order.PAYMENT_METHOD_CHOICES,
+    )
+    after = forms.CharField(required=False, widget=forms.HiddenInput)
+    page_size = forms.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=MAX_ORDERS_PAGE_SIZE,
+        widget=forms.HiddenInput,
+    )
+    limit = forms.IntegerField(required=False, min_value=1, widget=forms.HiddenInput)
+    stream = forms.BooleanField(required=False, widget=forms.HiddenInput)
+
+    def clean_after(self):
+        after = self.cleaned_data['after']
+        if not after:
+            return None
+        created_at, _, order_id = after.rpartition('_')
+        try:
+            parsed_created_at = parse_datetime(created_at) if created_at else None
+            order_id = int(order_id)
+        except ValueError:
+            parsed_created_at = None
+        if created_at and not parsed_created_at or not isinstance(order_id, int):
+            raise forms.ValidationError('Неверный курсор')
+        return parsed_created_at, order_id
+
+
+def encode_orders_cursor(order):
+    created_at = order.created_at.isoformat() if order.created_at else ''
+    return f'{created_at}_{order.id}'
+
+
+def filter_orders(filters):
+    orders = Order.objects.prefetch_related('items').exclude(status=Order.DELIVERED)
+    if filters.get('status'):
+        orders = orders.filter(status=filters['status'])
+    if filters.get('payment_method'):
+        orders = orders.filter(payment_method=filters['payment_method'])
+    return orders
+
+
+def get_orders_page(filters):
+    # NULLs last is the order of the (created_at, id) index on Postgres
+    orders = filter_orders(filters).order_by(F('created_at').asc(nulls_last=True), 'id')
+    if filters.get('after'):
+        created_at, order_id = filters['after']
+        if created_at is None:
+            orders = orders.filter(created_at__isnull=True, id__gt=order_id)
+        else:
+            orders = orders.filter(
+                Q(created_at__gt=created_at)
+                | Q(created_at=created_at, id__gt=order_id)
+                | Q(created_at__isnull=True)
+            )
+
+    page_size = filters.get('page_size') or ORDERS_PAGE_SIZE
+    orders = list(orders[:page_size + 1])
+    next_cursor = encode_orders_cursor(orders[page_size - 1]) if len(orders) > page_size else None
+    return orders[:page_size], next_cursor
+
+
+def stream_orders(request, context, orders, matcher):
+    head, tail = render_to_string('order_items.html', context, request).split(ORDER_ROWS_MARKER)
+    yield head
+    for start in range(0, len(orders), ORDERS_STREAM_CHUNK_SIZE):
+        orders_chunk = matcher.match(orders[start:start + ORDERS_STREAM_CHUNK_SIZE])
+        for order in orders_chunk:
+            yield render_to_string('order_row.html', {'item': order}, request)
+    yield tail
+
+
+def stream_order_events(subscription, lifetime):
+    # the stream holds a server worker, so it ends after `lifetime` seconds
+    # and the browser reconnects after the `retry` delay
+    deadline = time.monotonic() + lifetime
+    try:
+        yield f'retry: {ORDER_EVENTS_RECONNECT_DELAY}\n\n'
+        while True:
+            remaining_time = deadline - time.monotonic()
+            if remaining_time <= 0:
+                return
+            event = subscription.get_event(timeout=min(ORDER_EVENTS_HEARTBEAT_INTERVAL, remaining_time))
+            if event is None:
+                yield ': heartbeat\n\n'
+                continue
+            yield f"event: {event['type']}\ndata: {dumps(event['order']).decode()}\n\n"
+    finally:
+        subscription.close()
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def order_events(request):
+    response = StreamingHttpResponse(
+        stream_order_events(get_event_bus().subscribe(), settings.ORDER_EVENTS_STREAM_LIFETIME),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders(request):
+    filters_form = OrdersFilter(request.GET)
+    filters = filters_form.cleaned_data if filters_form.is_valid() else {}
+    orders, next_cursor = get_orders_page(filters)
+    matcher = RestaurantMatcher(restaurants_limit=filters.get('limit'))
+
+    next_page_params = None
+    if next_cursor:
+        next_page_params = request.GET.copy()
+        next_page_params['after'] = next_cursor
+        next_page_params = next_page_params.urlencode()
+    context = {
+        'filters_form': filters_form,
+        'next_page_params': next_page_params,
+    }
+
+    if filters.get('stream'):
+        context['order_rows_marker'] = ORDER_ROWS_MARKER
+        return StreamingHttpResponse(stream_orders(request, context, orders, matcher))
+
+    context['order_items'] = matcher.match(orders)
+    return render(request, template_name='order_items.html', context=context)
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_order_row(request, order_id):
+    filters_form = OrdersFilter(request.GET)
+    filters = filters_form.cleaned_data if filters_form.is_valid() else {}
+    order = filter_orders(filters).filter(pk=order_id).first()
+    if order is None:
+        # the order is not shown with these filters
+        return HttpResponse(status=204)
+    matcher = RestaurantMatcher(restaurants_limit=filters.get('limit'))
+    order, = matcher.match([order])
+    return render(request, template_name='order_row.html', context={'item': order})
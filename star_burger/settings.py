@@ -89,6 +89,18 @@ DATABASES = {
     )
 }
 
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'foodcartapp.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', 300)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -126,5 +138,38 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "bundles"),
 ]
 
-YANDEX_GEO_TOKEN = env('YANDEX_GEO_TOKEN')
+YANDEX_GEO_TOKEN = env.str('YANDEX_GEO_TOKEN', None)
 COORDINATES_LIFETIME = env.int('COORDINATES_LIFETIME')
+COORDINATES_CACHE_SIZE = env.int('COORDINATES_CACHE_SIZE', 1000)
+COORDINATES_CACHE_TTL = env.int('COORDINATES_CACHE_TTL', 300)
+COORDINATES_CACHE_STATS_INTERVAL = env.int('COORDINATES_CACHE_STATS_INTERVAL', 1000)
+GEOCODER_BACKEND = env.str('GEOCODER_BACKEND', 'coordinates.yandex_geo_api.YandexGeocoder')
+GEOCODER_OFFLINE_BOUNDING_BOX = env.list('GEOCODER_OFFLINE_BOUNDING_BOX', [37.35, 55.57, 37.85, 55.91], subcast=float)
+GEOCODER_GAZETTEER_PATH = env.str('GEOCODER_GAZETTEER_PATH', None)
+GEOCODER_RECORDED_BACKEND = env.str('GEOCODER_RECORDED_BACKEND', 'coordinates.yandex_geo_api.YandexGeocoder')
+GEOCODER_RECORDINGS_PATH = env.str('GEOCODER_RECORDINGS_PATH', os.path.join(BASE_DIR, 'geocoder_recordings.json'))
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 4)
+GEOCODER_RATE_LIMIT = env.float('GEOCODER_RATE_LIMIT', 10)
+GEOCODER_FAILURE_THRESHOLD = env.int('GEOCODER_FAILURE_THRESHOLD', 5)
+GEOCODER_RECOVERY_TIMEOUT = env.float('GEOCODER_RECOVERY_TIMEOUT', 60)
+DISTANCE_ACCURACY = env.str('DISTANCE_ACCURACY', 'haversine')
+IDEMPOTENCY_KEY_LIFETIME = env.int('IDEMPOTENCY_KEY_LIFETIME', 24)
+ORDER_EVENTS_BACKEND = env.str('ORDER_EVENTS_BACKEND', 'restaurateur.events.InProcessEventBus')
+ORDER_EVENTS_STREAM_LIFETIME = env.int('ORDER_EVENTS_STREAM_LIFETIME', 60)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'coordinates': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}